@@ -18,6 +18,7 @@ public class Gaze : MonoBehaviour
     IPAddress localAdd;
     TcpListener listener;
     TcpClient client;
+    BinaryReader reader;
     Vector3 receivedPos = Vector3.zero;
 
     bool running;
@@ -61,6 +62,7 @@ public class Gaze : MonoBehaviour
         listener.Start();
 
         client = listener.AcceptTcpClient();
+        reader = new BinaryReader(client.GetStream());
 
         running = true;
         while (running)
@@ -72,39 +74,15 @@ public class Gaze : MonoBehaviour
 
     void SendAndReceiveData()
     {
-        NetworkStream nwStream = client.GetStream();
-        byte[] buffer = new byte[client.ReceiveBufferSize];
-
         //---receiving Data from the Host----
-        int bytesRead = nwStream.Read(buffer, 0, client.ReceiveBufferSize); //Getting data in Bytes from Python
-        string dataReceived = Encoding.UTF8.GetString(buffer, 0, bytesRead); //Converting byte data to string
-
-        if (dataReceived != null)
-        {
-            //---Using received data---
-            receivedPos = StringToVector3(dataReceived); //<-- assigning receivedPos value from Python
-            print(receivedPos);
-        }
-    }
-
-    public static Vector3 StringToVector3(string sVector)
-    {
-        // Remove the parentheses
-        if (sVector.StartsWith("(") && sVector.EndsWith(")"))
-        {
-            sVector = sVector.Substring(1, sVector.Length - 2);
-        }
-
-        // split the items
-        string[] sArray = sVector.Split(',');
-
-        // store as a Vector3
-        Vector3 result = new Vector3(
-            float.Parse(sArray[0]),
-            float.Parse(sArray[1]),
-            float.Parse(sArray[2]));
-
-        return result;
+        //Python sends three little-endian int32 values: x, y and blink
+        int x = reader.ReadInt32();
+        int y = reader.ReadInt32();
+        int blink = reader.ReadInt32();
+
+        //---Using received data---
+        receivedPos = new Vector3(x, y, blink); //<-- assigning receivedPos value from Python
+        print(receivedPos);
     }
     /*
     public static string GetLocalIPAddress()
@@ -1,16 +1,65 @@
 #!/usr/bin/env python
 
-from threading import Thread, Lock
+from threading import Thread, Lock, Condition
+from queue import Queue, Empty, Full
 import cv2
 
 class WebcamVideoStream():
 
-    def __init__(self, src = 0) :
+    def __init__(self, src = 0, yuy2 = False, width = 640, height = 480, fps = 30) :
 
         self.stream = cv2.VideoCapture(src)
-        (self.grabbed, self.frame) = self.stream.read()
+        self.yuy2 = yuy2 and self._request_yuy2()
+
+        # The face detector does not need more than 640x480, a smaller
+        # capture size means less data to move through the whole pipeline
+        self.stream.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.stream.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.stream.set(cv2.CAP_PROP_FPS, fps)
+
+        # Size the camera actually delivers, used to unpack YUY2 frames
+        self.width = int(self.stream.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.stream.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        (self.grabbed, self.frame) = self._read_stream()
+        self.frame_id = 0
         self.started = False
         self.read_lock = Lock()
+        self.error = None
+        self.new_frame = Condition(self.read_lock)
+
+    def _request_yuy2(self) :
+
+        # Ask the camera for raw YUY2 frames so the luma plane can be used
+        # as the grayscale image, fall back to BGR if it is not supported
+        fourcc = cv2.VideoWriter_fourcc('Y', 'U', 'Y', '2')
+        self.stream.set(cv2.CAP_PROP_FOURCC, fourcc)
+
+        if int(self.stream.get(cv2.CAP_PROP_FOURCC)) != fourcc :
+
+            return False
+
+        if not self.stream.set(cv2.CAP_PROP_CONVERT_RGB, 0) :
+
+            return False
+
+        return True
+
+    def _read_stream(self) :
+
+        (grabbed, frame) = self.stream.read()
+
+        if grabbed and self.yuy2 :
+
+            # Some backends return the raw buffer as a single row
+            if frame.size != self.height * self.width * 2 :
+
+                raise ValueError("expected a %dx%d YUY2 frame (%d bytes), the camera returned %d bytes"
+                                 % (self.width, self.height, self.height * self.width * 2, frame.size))
+
+            frame = frame.reshape(self.height, self.width, 2)
+
+        return (grabbed, frame)
 
     def start(self) :
 
@@ -28,12 +77,26 @@ class WebcamVideoStream():
 
     def update(self) :
 
+        # Kept so the consumers can report why the camera thread stopped
+        try :
+
+            self._capture_frames()
+
+        except Exception as error :
+
+            self.error = error
+
+    def _capture_frames(self) :
+
         while self.started :
 
-            (grabbed, frame) = self.stream.read()
-            self.read_lock.acquire()
-            self.grabbed, self.frame = grabbed, frame
-            self.read_lock.release()
+            (grabbed, frame) = self._read_stream()
+
+            with self.new_frame :
+
+                self.grabbed, self.frame = grabbed, frame
+                self.frame_id += 1
+                self.new_frame.notify_all()
 
     def read(self) :
 
@@ -43,6 +106,23 @@ class WebcamVideoStream():
 
         return frame
 
+    def read_new(self, last_id, timeout = None) :
+
+        """Waits for a frame newer than last_id and returns it with its
+        id, or (None, last_id) if none arrived before the timeout"""
+
+        with self.new_frame :
+
+            if not self.new_frame.wait_for(lambda : self.frame_id != last_id, timeout) :
+
+                return None, last_id
+
+            if self.frame is None :
+
+                raise RuntimeError("could not read a frame from the camera")
+
+            return self.frame.copy(), self.frame_id
+
     def stop(self) :
 
         self.started = False
@@ -52,4 +132,124 @@ class WebcamVideoStream():
 
     def __exit__(self, exc_type, exc_value, traceback) :
 
-        self.stream.release()
\ No newline at end of file
+        self.stream.release()
+
+
+class PreprocessedVideoStream():
+
+    """Runs a preprocessing function on the frames of a
+    WebcamVideoStream on its own thread. Only the most recent
+    result is kept so the consumer always gets the freshest frame.
+
+    preprocess(frame, out) may write into out, a previous result that
+    is no longer used. A result returned by read is recycled once
+    read is called again.
+    """
+
+    # Seconds the threads wait before checking that the producer is alive
+    POLL_TIMEOUT = 0.5
+
+    def __init__(self, stream, preprocess) :
+
+        self.stream = stream
+        self.preprocess = preprocess
+        self.queue = Queue(maxsize=1)
+        self.free = Queue()
+        self.current = None
+        self.error = None
+        self.started = False
+
+    def start(self) :
+
+        if self.started :
+
+            print ("already started!!")
+
+            return None
+
+        self.started = True
+        self.thread = Thread(target=self.update, args=())
+        self.thread.start()
+
+        return self
+
+    def update(self) :
+
+        # Errors are handed to the consumer, read would block otherwise
+        try :
+
+            self._process_frames()
+
+        except Exception as error :
+
+            self.error = error
+
+    def _process_frames(self) :
+
+        last_id = None
+
+        while self.started :
+
+            frame, frame_id = self.stream.read_new(last_id, self.POLL_TIMEOUT)
+
+            if frame is None :
+
+                if not self.stream.thread.is_alive() :
+
+                    raise RuntimeError("the camera thread has stopped") from self.stream.error
+
+                continue
+
+            last_id = frame_id
+
+            try :
+                out = self.free.get_nowait()
+            except Empty :
+                out = None
+
+            item = (frame, self.preprocess(frame, out))
+
+            # Drop the stale result if the consumer has not taken it yet
+            try :
+                self.free.put(self.queue.get_nowait()[1])
+            except Empty :
+                pass
+
+            try :
+                self.queue.put_nowait(item)
+            except Full :
+                pass
+
+    def read(self) :
+
+        """Returns the latest frame and its preprocessed data"""
+
+        if self.current is not None :
+
+            self.free.put(self.current[1])
+            self.current = None
+
+        while self.current is None :
+
+            try :
+
+                self.current = self.queue.get(timeout=self.POLL_TIMEOUT)
+
+            except Empty :
+
+                if self.error is not None :
+
+                    raise RuntimeError("frame preprocessing failed") from self.error
+
+                if not self.thread.is_alive() :
+
+                    raise RuntimeError("the preprocessing thread has stopped")
+
+        return self.current
+
+    def stop(self) :
+
+        self.started = False
+        if self.thread.is_alive():
+
+            self.thread.join()
@@ -0,0 +1,110 @@
+from __future__ import division
+import os
+import numpy as np
+import dlib
+
+
+class LandmarkDetector(object):
+
+    """
+    This class finds the face in a frame and returns its
+    68 facial landmarks
+    """
+
+    # The face detector runs once every DETECTION_INTERVAL frames, the
+    # face is tracked in between unless the tracker confidence drops
+    # below TRACKER_MIN_CONFIDENCE
+    DETECTION_INTERVAL = 10
+    TRACKER_MIN_CONFIDENCE = 7.0
+
+    def __init__(self):
+
+        self._frame_idx = 0
+        self._tracker = None
+
+        cwd = os.path.abspath(os.path.dirname(__file__))
+
+        # _face_detector is used to detect faces, the CNN (MMOD) detector
+        # is used when dlib was built with CUDA and its model is available.
+        # The model is not shipped, download mmod_human_face_detector.dat.bz2
+        # from https://github.com/davisking/dlib-models and unpack it into
+        # trained_models/
+        cnn_model_path = os.path.abspath(os.path.join(cwd, "trained_models/mmod_human_face_detector.dat"))
+        self._use_cnn = dlib.DLIB_USE_CUDA and os.path.isfile(cnn_model_path)
+
+        if self._use_cnn:
+
+            self._face_detector = dlib.cnn_face_detection_model_v1(cnn_model_path)
+
+        else:
+
+            self._face_detector = dlib.get_frontal_face_detector()
+
+        # _predictor is used to get facial landmarks of a given face
+        model_path = os.path.abspath(os.path.join(cwd, "trained_models/shape_predictor_68_face_landmarks.dat"))
+        self._predictor = dlib.shape_predictor(model_path)
+
+    def _detect_face(self, frame, small):
+
+        """Locates the face on the downscaled frame and returns it mapped
+        back to full resolution. The face detector only runs every
+        DETECTION_INTERVAL frames, a correlation tracker follows the
+        face in between
+
+        Arguments:
+            frame (numpy.ndarray): Grayscale frame to search for a face
+            small (numpy.ndarray): Downscaled copy of frame
+        """
+
+        scale = small.shape[1] / frame.shape[1]
+
+        face = None
+
+        if self._tracker is not None and self._frame_idx % self.DETECTION_INTERVAL != 0:
+
+            if self._tracker.update(small) >= self.TRACKER_MIN_CONFIDENCE:
+
+                face = self._tracker.get_position()
+
+        self._frame_idx += 1
+
+        if face is None:
+
+            faces = self._face_detector(small, 0)
+
+            if len(faces) == 0:
+
+                self._tracker = None
+
+                return None
+
+            # The CNN detector returns mmod_rectangles
+            face = faces[0].rect if self._use_cnn else faces[0]
+
+            self._tracker = dlib.correlation_tracker()
+            self._tracker.start_track(small, face)
+
+        return dlib.rectangle(int(face.left() / scale), int(face.top() / scale),
+                              int(face.right() / scale), int(face.bottom() / scale))
+
+    def locate(self, frame, small):
+
+        """Returns the facial landmarks as a (68, 2) numpy.ndarray,
+        or None if no face was found
+
+        Arguments:
+            frame (numpy.ndarray): Grayscale frame to search for a face
+            small (numpy.ndarray): Downscaled copy of frame
+        """
+
+        face = self._detect_face(frame, small)
+
+        if face is None:
+
+            return None
+
+        shape = self._predictor(frame, face)
+
+        # Converting all the landmarks at once avoids a dlib call
+        # for every coordinate
+        return np.array([(p.x, p.y) for p in shape.parts()], np.int32)
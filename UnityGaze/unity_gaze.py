@@ -1,9 +1,9 @@
 from __future__ import division
-import os
+import numpy as np
 import cv2
-import dlib
 from .eye import Eye
 from .calibration import Calibration
+from .detector import LandmarkDetector
 
 
 class GazeEstimation(object):
@@ -14,7 +14,16 @@ class GazeEstimation(object):
     and pupils and allows to know if the eyes are open or closed
     """
 
-    def __init__(self):
+    # Width (in pixels) the frame is downscaled to before face detection
+    DETECTION_WIDTH = 480
+
+    def __init__(self, use_opencl=False):
+
+        """
+        Arguments:
+            use_opencl (bool): Runs the frame preprocessing through
+                OpenCL when a device is available
+        """
 
         self.frame = None
         self.eye_left = None
@@ -22,55 +31,174 @@ class GazeEstimation(object):
         self.coords_arr = None
         self.calibration = Calibration()
 
-        # _face_detector is used to detect faces
-        self._face_detector = dlib.get_frontal_face_detector()
+        # Per frame results, see _compute_derived
+        self._pupils_located = False
+        self._horizontal_ratio = None
+        self._vertical_ratio = None
+        self._blink_ratio = None
 
-        # _predictor is used to get facial landmarks of a given face
-        cwd = os.path.abspath(os.path.dirname(__file__))
-        model_path = os.path.abspath(os.path.join(cwd, "trained_models/shape_predictor_68_face_landmarks.dat"))
-        self._predictor = dlib.shape_predictor(model_path)
+        # Buffers reused by refresh when it preprocesses the frame itself
+        self._buffers = None
+
+        # _landmark_detector finds the face and its facial landmarks
+        self._landmark_detector = LandmarkDetector()
+
+        # OpenCL is opt-in, uploading a single small frame rarely pays off
+        # and the preallocated buffers can not be reused on that path
+        self._use_opencl = use_opencl and cv2.ocl.haveOpenCL()
+
+        if self._use_opencl:
+            cv2.ocl.setUseOpenCL(True)
 
     @property
     def pupils_located(self):
 
         """Check that the pupils have been located"""
 
-        try:
+        return self._pupils_located
+
+    def _locate_pupils(self):
+
+        """Returns true if both pupils were found in the current frame"""
+
+        for eye in (self.eye_left, self.eye_right):
+
+            if eye is None or eye.pupil is None:
+
+                return False
+
+            if eye.pupil.x is None or eye.pupil.y is None:
+
+                return False
+
+        return True
+
+    def _compute_derived(self):
+
+        """Computes the gaze ratios and the blinking ratio once per frame,
+        the public accessors only return these cached values
+        """
+
+        self._pupils_located = self._locate_pupils()
+        self._horizontal_ratio = None
+        self._vertical_ratio = None
+        self._blink_ratio = None
+
+        if not self._pupils_located:
+
+            return
+
+        # Eye frame sizes without the margins, clamped so a tiny eye
+        # frame can not cause a division by zero
+        inv_left_w = 1.0 / max(self.eye_left.center[0] * 2 - 10, 1)
+        inv_right_w = 1.0 / max(self.eye_right.center[0] * 2 - 10, 1)
+        inv_left_h = 1.0 / max(self.eye_left.center[1] * 2 - 10, 1)
+        inv_right_h = 1.0 / max(self.eye_right.center[1] * 2 - 10, 1)
+
+        self._horizontal_ratio = (self.eye_left.pupil.x * inv_left_w + self.eye_right.pupil.x * inv_right_w) * 0.5
+        self._vertical_ratio = (self.eye_left.pupil.y * inv_left_h + self.eye_right.pupil.y * inv_right_h) * 0.5
+
+        # Eye.blinking is None when the eye height is zero
+        if self.eye_left.blinking is not None and self.eye_right.blinking is not None:
+
+            self._blink_ratio = (self.eye_left.blinking + self.eye_right.blinking) / 2
+
+    @staticmethod
+    def _is_yuy2(frame):
+
+        """Returns true if the frame is a packed YUY2 image (2 channels)"""
+
+        return frame.ndim == 3 and frame.shape[2] == 2
+
+    def preprocess(self, frame, out=None):
+
+        """Converts a camera frame into the images used for the analysis.
+        It only depends on the frame so it can run on another thread.
+
+        Arguments:
+            frame (numpy.ndarray): BGR or YUY2 frame from the camera
+            out (tuple): A previous result of preprocess whose arrays are
+                overwritten instead of allocating new ones
+
+        Returns:
+            The mirrored grayscale frame and its downscaled copy used
+            for face detection
+        """
+
+        scale = min(self.DETECTION_WIDTH / frame.shape[1], 1.0)
 
-            int(self.eye_left.pupil.x)
-            int(self.eye_left.pupil.y)
-            int(self.eye_right.pupil.x)
-            int(self.eye_right.pupil.y)
+        if self._is_yuy2(frame):
 
-            return True
+            gray, small = self._output_buffers(frame.shape[:2], scale, out)
 
-        except Exception:
+            # The luma channel already is the grayscale image
+            np.copyto(gray, frame[:, ::-1, 0])
+            cv2.resize(gray, small.shape[::-1], dst=small, interpolation=cv2.INTER_AREA)
 
-            return False
+            return gray, small
 
-    def _analyze(self):
+        if self._use_opencl:
 
-        """Detects the face and initialize Eye objects"""
+            # The images stay on the OpenCL device until dlib needs them
+            gray = cv2.flip(cv2.cvtColor(cv2.UMat(frame), cv2.COLOR_BGR2GRAY), 1)
+            small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+            return gray.get(), small.get()
+
+        gray, small = self._output_buffers(frame.shape[:2], scale, out)
+
+        # Mirroring the single channel image is a third of the work of
+        # mirroring the colour frame, the flip is done in place
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+        cv2.flip(gray, 1, dst=gray)
+        cv2.resize(gray, small.shape[::-1], dst=small, interpolation=cv2.INTER_AREA)
+
+        return gray, small
+
+    @staticmethod
+    def _output_buffers(shape, scale, out):
+
+        """Returns the (gray, small) arrays preprocess writes into, reusing
+        out when it matches the frame size
+
+        Arguments:
+            shape (tuple): Height and width of the camera frame
+            scale (float): Downscaling factor used for face detection
+            out (tuple): Previous result of preprocess, or None
+        """
+
+        height, width = shape
+        small_shape = (max(int(round(height * scale)), 1), max(int(round(width * scale)), 1))
+
+        if out is not None and out[0].shape == shape and out[1].shape == small_shape:
+
+            return out
+
+        return np.empty(shape, np.uint8), np.empty(small_shape, np.uint8)
+
+    def _analyze(self, preprocessed):
+
+        """Detects the face and initialize Eye objects
+
+        Arguments:
+            preprocessed (tuple): Output of preprocess for the current frame
+        """
         
-        frame = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
-        faces = self._face_detector(frame)
+        frame, small = preprocessed
+        landmarks = self._landmark_detector.locate(frame, small)
 
-        try:
+        if landmarks is None:
 
-            landmarks = self._predictor(frame, faces[0])
+            self.eye_left = None
+            self.eye_right = None
 
-            left_x1 = landmarks.part(36).x
-            left_x2 = landmarks.part(39).x
-            left_y1 = landmarks.part(37).y
-            left_y2 = landmarks.part(40).y
+            return
 
-            right_x1 = landmarks.part(42).x
-            right_x2 = landmarks.part(45).x
-            right_y1 = landmarks.part(44).y
-            right_y2 = landmarks.part(47).y
+        try:
 
-            left_eye_bbox_coords = [left_x1, left_x2, left_y1, left_y2]
-            right_eye_bbox_coordds = [right_x1, right_x2, right_y1, right_y2]
+            # [x1, x2, y1, y2] of the extreme points of each eye
+            left_eye_bbox_coords = landmarks[[36, 39, 37, 40], [0, 0, 1, 1]].tolist()
+            right_eye_bbox_coordds = landmarks[[42, 45, 44, 47], [0, 0, 1, 1]].tolist()
 
             self.coords_arr = (left_eye_bbox_coords, right_eye_bbox_coordds)
 
@@ -82,16 +210,22 @@ class GazeEstimation(object):
             self.eye_left = None
             self.eye_right = None
 
-    def refresh(self, frame):
+    def refresh(self, frame, preprocessed=None):
 
         """Refreshes the frame and analyzes it.
 
         Arguments:
             frame (numpy.ndarray): The frame to analyze
+            preprocessed (tuple): Output of preprocess for this frame,
+                computed here when not given
         """
         
-        self.frame = cv2.flip(frame, 1)
-        self._analyze()
+        if preprocessed is None:
+            preprocessed = self._buffers = self.preprocess(frame, self._buffers)
+
+        self.frame = frame
+        self._analyze(preprocessed)
+        self._compute_derived()
 
     def pupil_left_coords(self):
 
@@ -122,12 +256,7 @@ class GazeEstimation(object):
         the center is 0.5 and the extreme left is 1.0
         """
         
-        if self.pupils_located:
-
-            pupil_left = self.eye_left.pupil.x / (self.eye_left.center[0] * 2 - 10)
-            pupil_right = self.eye_right.pupil.x / (self.eye_right.center[0] * 2 - 10)
-            
-            return (pupil_left + pupil_right) / 2
+        return self._horizontal_ratio
 
     def vertical_ratio(self):
 
@@ -136,12 +265,7 @@ class GazeEstimation(object):
         the center is 0.5 and the extreme bottom is 1.0
         """
         
-        if self.pupils_located:
-
-            pupil_left = self.eye_left.pupil.y / (self.eye_left.center[1] * 2 - 10)
-            pupil_right = self.eye_right.pupil.y / (self.eye_right.center[1] * 2 - 10)
-            
-            return (pupil_left + pupil_right) / 2
+        return self._vertical_ratio
 
     def is_right(self):
 
@@ -171,17 +295,20 @@ class GazeEstimation(object):
 
         """Returns true if the user closes his eyes"""
 
-        if self.pupils_located:
+        if self._blink_ratio is not None:
 
-            blinking_ratio = (self.eye_left.blinking + self.eye_right.blinking) / 2
-            
-            return blinking_ratio > 3.8
+            return self._blink_ratio > 3.8
 
     def annotated_frame(self):
 
-        """Returns the main frame with pupils highlighted"""
+        """Returns the mirrored main frame with pupils highlighted"""
         
-        frame = self.frame.copy()
+        frame = self.frame
+
+        if self._is_yuy2(frame):
+            frame = cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_YUY2)
+
+        frame = cv2.flip(frame, 1)
 
         if self.pupils_located:
 
@@ -191,11 +318,19 @@ class GazeEstimation(object):
 
             acc_x, acc_y = int((x_left + x_right)/2), int((y_left + y_right)/2)
 
-            cv2.line(frame, (x_left - 1, y_left), (x_left + 1, y_left), color)
-            cv2.line(frame, (x_left, y_left - 1), (x_left, y_left + 1), color)
-            
-            cv2.line(frame, (x_right - 1, y_right), (x_right + 1, y_right), color)
-            cv2.line(frame, (x_right, y_right - 1), (x_right, y_right + 1), color)
+            # The crosshairs are 3 pixels wide, writing them directly
+            # into the frame is cheaper than going through cv2.line.
+            # The mirrored frame is already a new array, no copy needed.
+            # The slices start at 0 at most so they are clipped like
+            # cv2.line instead of wrapping around
+            height, width = frame.shape[:2]
+
+            for x, y in ((x_left, y_left), (x_right, y_right)):
+
+                if 0 <= x < width and 0 <= y < height:
+
+                    frame[y, max(x - 1, 0):x + 2] = color
+                    frame[max(y - 1, 0):y + 2, x] = color
 
         return frame
 
@@ -0,0 +1,24 @@
+#!/usr/bin/env bash
+#author: Sourav R S
+#Github: https://github.com/souravrs999
+
+# Rebuilds dlib from source with AVX instructions and an optimized BLAS.
+# The prebuilt pip wheel is usually compiled without AVX and without
+# OpenBLAS/MKL, which slows down both the HOG face detector and the
+# 68 point shape predictor used by UnityGaze.
+#
+# Usage: ./build_dlib.sh  (run inside the python environment used for main.py)
+
+set -e
+
+sudo apt install -y build-essential cmake libopenblas-dev liblapack-dev
+
+pip uninstall -y dlib
+
+BUILD_DIR=$(mktemp -d)
+git clone --depth 1 https://github.com/davisking/dlib.git "$BUILD_DIR/dlib"
+cd "$BUILD_DIR/dlib"
+
+python setup.py install --set USE_AVX_INSTRUCTIONS=1 --set DLIB_USE_BLAS=1
+
+python -c "import dlib; print('AVX:', dlib.USE_AVX_INSTRUCTIONS, 'BLAS:', dlib.DLIB_USE_BLAS)"
@@ -4,12 +4,14 @@
 
 #General Imports
 import cv2
-import time
 import socket
+import struct
 import numpy as np
 from UnityGaze import GazeEstimation
-from scipy.spatial import distance as dist
-from UnityGaze.VideoCapture import WebcamVideoStream
+from UnityGaze.VideoCapture import WebcamVideoStream, PreprocessedVideoStream
+
+# Maximum width of the frames shown in the demo window
+DISPLAY_WIDTH = 640
 
 # Get the screen resolution
 def get_screen_res():
@@ -23,70 +25,74 @@ def get_screen_res():
 
     return screen_width, screen_height
 
-def get_gaze_coords(cam_frame):
+# Numba is optional, without it the ratios are computed in plain Python
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        return lambda func: func
 
-    left_pupil = gaze.pupil_left_coords()
-    right_pupil = gaze.pupil_right_coords()
-    coord_coll = gaze.eye_roi_bb()
-
-    if coord_coll is not None:
+@njit(cache=True)
+def _compute_ratios(lpx, lpy, rpx, rpy, lx1, lx2, ly1, ly2, rx1, rx2, ry1, ry2):
 
-        left_coords = coord_coll[0]
-        right_coords = coord_coll[1]
+    ''' Average of the extreme cordinates of
+    left pupil and right pupil '''
 
-        left_x1 = left_coords[0]
-        left_x2 = left_coords[1]
-        left_y1 = left_coords[2]
-        left_y2 = left_coords[3]
+    avg_x1 = (lx1 + rx1)/2 + 5
+    avg_x2 = (lx2 + rx2)/2 - 5
+    avg_y1 = (ly1 + ry1)/2 - 2
+    avg_y2 = (ly2 + ry2)/2 + 2
 
-        right_x1 = right_coords[0]
-        right_x2 = right_coords[1]
-        right_y1 = right_coords[2]
-        right_y2 = right_coords[3]
+    '''Width and height of the bounding box, the
+    box is axis aligned so these are plain differences'''
 
-        ''' Average of the extreme cordinates of
-        left pupil and right pupil '''
+    avg_bbox_w = abs(avg_x2 - avg_x1)
+    avg_bbox_h = abs(avg_y2 - avg_y1)
 
-        avg_x1 = int((left_x1 + right_x1)/2 + 5)
-        avg_x2 = int((left_x2 + right_x2)/2 - 5) 
-        avg_y1 = int((left_y1 + right_y1)/2 - 2)
-        avg_y2 = int((left_y2 + right_y2)/2 + 2)
+    ''' Average pupil center '''
 
-        '''Find the distance between the centre
-        points of the bounding box to get the width
-        and height of the box'''
+    avg_pupil_x = (rpx + lpx)/2
+    avg_pupil_y = (rpy + lpy)/2
 
-        avg_bbox_w = int(dist.euclidean((avg_x1,avg_y1), (avg_x2, avg_y1)))
-        avg_bbox_h = int(dist.euclidean((avg_x1,avg_y1), (avg_x1, avg_y2)))
+    ''' Distance of the gaze coordinate from the left
+    and top of the bounding box '''
 
-        if left_pupil or right_pupil is not None:
+    p_2_bbox_w_d = abs(avg_pupil_x - avg_x1)
+    p_2_bbox_h_d = abs(avg_pupil_y - avg_y1)
 
-            try:
+    ''' Clamped to a pixel so a pupil on the edge of the
+    bounding box does not divide by zero, the box size is
+    clamped too since the screen coordinates divide by the ratios '''
 
-                ''' Average pupil center '''
+    avg_bbox_w = max(avg_bbox_w, 1.0)
+    avg_bbox_h = max(avg_bbox_h, 1.0)
+    p_2_bbox_w_d = max(p_2_bbox_w_d, 1.0)
+    p_2_bbox_h_d = max(p_2_bbox_h_d, 1.0)
 
-                avg_pupil_x = int((right_pupil[0] + left_pupil[0])/2)
-                avg_pupil_y = int((right_pupil[1] + left_pupil[1])/2)
+    ''' Ratio of width and height of the gaze coordinate
+    with respect to the bounding box '''
 
-                p_x_2_bbox = (avg_x1, avg_pupil_y)
-                p_y_2_bbox = (avg_pupil_x, avg_y1)
+    p_x_2_bbox_w_r = avg_bbox_w/p_2_bbox_w_d
+    p_y_2_bbox_h_r = avg_bbox_h/p_2_bbox_h_d
 
-                ''' Distance of the gaze coordinate from the left
-                and top of the bounding box '''
+    return p_x_2_bbox_w_r, p_y_2_bbox_h_r
 
-                p_2_bbox_w_d = int(dist.euclidean((p_x_2_bbox), (avg_pupil_x, avg_pupil_y)))
-                p_2_bbox_h_d = int(dist.euclidean((p_y_2_bbox), (avg_pupil_x, avg_pupil_y)))
+def get_gaze_coords(cam_frame):
 
-                ''' Ratio of width and height of the gaze coordinate
-                with respect to the bounding box '''
+    left_pupil = gaze.pupil_left_coords()
+    right_pupil = gaze.pupil_right_coords()
+    coord_coll = gaze.eye_roi_bb()
 
-                p_x_2_bbox_w_r = avg_bbox_w/p_2_bbox_w_d
-                p_y_2_bbox_h_r = avg_bbox_h/p_2_bbox_h_d
+    if coord_coll is None or left_pupil is None or right_pupil is None:
+        return None
 
-            except Exception:
-                pass
+    left_x1, left_x2, left_y1, left_y2 = coord_coll[0]
+    right_x1, right_x2, right_y1, right_y2 = coord_coll[1]
 
-            return p_x_2_bbox_w_r, p_y_2_bbox_h_r
+    return _compute_ratios(float(left_pupil[0]), float(left_pupil[1]),
+                           float(right_pupil[0]), float(right_pupil[1]),
+                           float(left_x1), float(left_x2), float(left_y1), float(left_y2),
+                           float(right_x1), float(right_x2), float(right_y1), float(right_y2))
 
 if __name__ == "__main__":
 
@@ -99,43 +105,56 @@ if __name__ == "__main__":
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     sock.connect((host, port))
 
-    cam = WebcamVideoStream(2).start()
+    cam = WebcamVideoStream(2, yuy2=True).start()
+    stream = PreprocessedVideoStream(cam, gaze.preprocess).start()
+
+    cv2.namedWindow('Demo',cv2.WINDOW_NORMAL)
 
-    while True:
+    # The capture threads must be stopped even if the loop raises,
+    # the interpreter would not exit otherwise
+    try:
+
+        while True:
         
-        frame = cam.read()
-        gaze.refresh(frame)
+            frame, preprocessed = stream.read()
+            gaze.refresh(frame, preprocessed)
+
+            p_xy = get_gaze_coords(frame)
+
+            if p_xy is not None:
 
-        p_xy = get_gaze_coords(frame)
+                ''' Estimating coordinates for the screen
+                with respect to its resolution '''
 
-        if p_xy is not None:
+                est_x = int((sc_width/p_xy[0]))
+                est_y = int((sc_height/p_xy[1]))
 
-            ''' Estimating coordinates for the screen
-            with respect to its resolution '''
+                if gaze.is_blinking():
+                    blink = 1
 
-            est_x = int((sc_width/p_xy[0]))
-            est_y = int((sc_height/p_xy[1]))
+                else:
+                    blink = 0
 
-            time.sleep(0.5)
+                # Three little-endian int32, read with BinaryReader in Gaze.cs
+                sock.sendall(struct.pack('<iii', est_x, est_y, blink))
 
-            if gaze.is_blinking:
-                blink = 1
+            frame = gaze.annotated_frame()
 
-            else:
-                blink = 0
+            ''' Only downscale frames wider than the window,
+            keeping the aspect ratio of the camera '''
 
-            gaze_coord = [est_x, est_y, blink]
+            height, width = frame.shape[:2]
 
-            packet = ','.join(map(str, gaze_coord))
-            sock.sendall(packet.encode("UTF-8")) 
+            if width > DISPLAY_WIDTH:
+                frame = cv2.resize(frame, (DISPLAY_WIDTH, int(height * DISPLAY_WIDTH / width)), interpolation=cv2.INTER_AREA)
 
-        frame = gaze.annotated_frame()
+            cv2.imshow("Demo", frame)
 
-        cv2.namedWindow('Demo',cv2.WINDOW_NORMAL)
-        cv2.imshow("Demo", frame)
+            if cv2.waitKey(1) == 27:
+                break
 
-        if cv2.waitKey(1) == 27:
-            break
+    finally:
 
-    cam.stop()
-    cv2.destroyAllWindows()
\ No newline at end of file
+        stream.stop()
+        cam.stop()
+        cv2.destroyAllWindows()
\ No newline at end of file